@@ -1,4 +1,4 @@
-from libfile import line_ui, line_server  # Import custom UI and server logic from external file
+from libfile import line_ui, line_server, fit_ui, fit_server, model_chain  # Import custom UI and server logic from external file
 from shiny import ui, App  # Import core Shiny components for UI and application
 import re  # Used for regular expression parsing
 import os  # Used to work with file paths
@@ -27,7 +27,7 @@ def create_ui_and_server(commands):
                 variable_store[var_name] = var_expr    # Store in the global dictionary
                 continue  # Skip further processing for this line
 
-        # ----------- PARSE FUNCTION CALL: line(...) or sliderupdate(...) -----------
+        # ----------- PARSE FUNCTION CALL: line(...), sliderupdate(...) or fit(...) -----------
         parts = command.split('(', 1)  # Split at first '(' to isolate function name and arguments
         if len(parts) != 2:
             raise ValueError(f"Invalid command format: {command}")
@@ -103,7 +103,8 @@ def create_ui_and_server(commands):
                 'func_list1': func_list1,
                 'func_list2': func_list2,
                 'x_label': x_label,
-                'y_label': y_label
+                'y_label': y_label,
+                'sliders': {}       # Slider ranges/defaults, filled in by sliderupdate commands
             }
 
             # Generate corresponding UI and add to the UI components list
@@ -134,6 +135,10 @@ def create_ui_and_server(commands):
                 x_label = plot['x_label']
                 y_label = plot['y_label']
 
+                # Remember the slider range and default so fit commands can reuse them
+                if not isinstance(value, list):
+                    plot['sliders'][param] = {'min': min_val, 'max': max_val, 'value': float(value)}
+
                 # Create a lambda function to dynamically update the slider on frontend
                 server_functions.append(
                     lambda id=id1, func_list1=func_list1, func_list2=func_list2,
@@ -145,6 +150,31 @@ def create_ui_and_server(commands):
                         )
                 )
 
+        # ====================== HANDLE FIT COMMAND ======================
+        elif cmd_type == 'fit':
+            if len(args) != 4:
+                raise ValueError(f"Expected 4 arguments in fit command, got {len(args)}: {command}")
+
+            id = args[0]             # Unique ID for this fit block
+            line_id = args[1]        # ID of the line plot whose equations are fitted
+            target = args[2]         # Equation label compared against the data (e.g., i_total)
+            free_params = args[3]    # Parameters fitted by default; the rest stay fixed
+
+            if line_id not in line_plots:
+                raise ValueError(f"Unknown line plot '{line_id}' in fit command: {command}")
+
+            plot = line_plots[line_id]
+            func_list = model_chain(plot['func_list1'] + plot['func_list2'], target)
+            x_label = plot['x_label']
+            sliders = plot['sliders']
+
+            ui_components.append(fit_ui(id, func_list, free_params, x_label, sliders))
+            server_functions.append(
+                lambda id=id, func_list=func_list, target=target, free_params=free_params,
+                       x_label=x_label, sliders=sliders:
+                    fit_server(id, func_list, target, free_params, x_label, sliders)
+            )
+
     # Return both lists for integration into the app (UI + server parts)
     return ui_components, server_functions
 
@@ -41,3 +41,11 @@ sliderupdate("func1", "conc", 0, 2, 0.5, 0.0001)
 # Slider to control the X-axis range for the voltage plot in mV
 # Allows zooming and panning across different voltage values
 sliderupdate("func1", "x_range_line", -1000, 1000, [-250, 250], 50, "voltage")
+
+# ---------- DEFINE A FIT BLOCK ----------
+# The `fit(...)` command adds a panel that fits the "func1" equations to an uploaded i-V dataset.
+# - "fit1": unique ID for the fit panel
+# - "func1": the line plot whose equations (and slider ranges/defaults) are used
+# - "i_total": the equation compared against the measured current column
+# - the list: parameters fitted by default; all others stay fixed at their entered values
+fit("fit1", "func1", "i_total", ["k", "beta", "U"])
@@ -1,8 +1,11 @@
 # ====================== IMPORT REQUIRED LIBRARIES ======================
 
 import re  # For extracting variable names from expressions using regex
+import os  # To size the process pool used for multi-start fitting
+import asyncio  # To wait on the fit workers without blocking the Shiny event loop
+from concurrent.futures import ProcessPoolExecutor  # Parallel multi-start fits
 from shiny import ui, module, reactive, render  # Core Shiny functions for UI and reactivity
-import pandas as pd  # To handle data if needed (not used in this snippet directly)
+import pandas as pd  # To read uploaded data files for fitting
 import numpy as np  # For numerical operations like linspace and arrays
 from bokeh.plotting import figure  # For creating interactive plots using Bokeh
 from shinywidgets import output_widget, bokeh_dependency, render_bokeh  # Shiny Bokeh integration
@@ -10,6 +13,8 @@ from bokeh.palettes import Category10  # Bokeh color palette with distinct line
 # For 3D and scatter plots using Plotly
 import plotly.graph_objects as go
 import plotly.io as pio
+# Bounded nonlinear least squares for fitting model parameters to data
+from scipy.optimize import least_squares
 
 # ====================== GLOBAL DICTIONARY FOR SLIDER STATE ======================
 
@@ -391,3 +396,364 @@ def scatter_server(input, output, session, file_name, x_label, y_label):
                 text=f"Error: {e}", textposition='middle center'
             ))
             return ui.HTML(pio.to_html(fig, full_html=True))
+
+
+# ====================== FITTING UTILITIES ======================
+
+# Process pool shared by all fit modules (created on first use)
+fit_executor = None
+
+# Cache of compiled model expressions, keyed by the tuple of equation strings
+compiled_models = {}
+
+# Upper limit on multi-start runs per fit (also enforced on the server, not just in the browser)
+MAX_FIT_STARTS = 64
+
+
+# Returns the equations needed to compute `target`, i.e. every equation up to and including it
+def model_chain(func_list, target):
+    labels = [func.split('=', 1)[0].strip() for func in func_list]
+    if target not in labels:
+        raise ValueError(f"Fit target '{target}' is not defined in {labels}")
+    return func_list[:labels.index(target) + 1]
+
+
+# Same parameter extraction as the line modules, applied to a single equation chain
+def model_parameters(func_list, x_label):
+    defined_vars = set([x_label])
+    params = set()
+    for func in func_list:
+        lhs_var, expression = func.split('=', 1)
+        params.update(extract_parameters(expression, defined_vars, x_label))
+        defined_vars.add(lhs_var.strip())
+    return sorted(params)
+
+
+# Compiles each equation once so repeated evaluations during fitting skip parsing
+def compile_model(func_list):
+    key = tuple(func_list)
+    if key not in compiled_models:
+        compiled_models[key] = [
+            (label.strip(), compile(expression.strip(), f"<{label.strip()}>", "eval"))
+            for label, expression in (func.split('=', 1) for func in func_list)
+        ]
+    return compiled_models[key]
+
+
+# Evaluates the compiled chain on the whole x array at once and returns the target values
+def evaluate_model(compiled, target, x_label, x, values):
+    context = {x_label: x, "np": np}
+    context.update(values)
+    for label, code in compiled:
+        context[label] = eval(code, context)
+    return context[target]
+
+
+# Runs one bounded least-squares fit from a single start point (executed in a worker process)
+def fit_single_start(func_list, target, x_label, x, y, free_params, fixed_values, start, bounds):
+    compiled = compile_model(func_list)
+    y_scale = np.max(np.abs(y)) or 1.0  # Keep residuals O(1) whatever the current units
+
+    def residuals(theta):
+        values = dict(fixed_values)
+        values.update(zip(free_params, theta))
+        return (evaluate_model(compiled, target, x_label, x, values) - y) / y_scale
+
+    try:
+        with np.errstate(over="ignore", invalid="ignore"):
+            result = least_squares(residuals, start, bounds=bounds, x_scale="jac")
+    except ValueError as e:
+        # Start points where the exponentials overflow give non-finite residuals; skip them
+        return None, np.inf, str(e), False
+    return result.x, 2 * result.cost * y_scale ** 2, result.message, result.success
+
+
+# Lazily creates the process pool so importing this file never spawns workers
+def get_fit_executor():
+    global fit_executor
+    if fit_executor is None:
+        fit_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return fit_executor
+
+
+# Multi-start fit of `free_params` to (x, y); other parameters stay at `fixed_values`
+# - The first start is the given initial values, the rest are drawn uniformly inside `bounds`
+# - `progress(done, total)` is called each time a start finishes
+# - Awaits the pool futures so the event loop (and every other session) keeps running meanwhile
+async def fit_model(func_list, target, x_label, x, y, free_params, fixed_values, bounds,
+                    n_starts=8, progress=None, seed=None):
+    if not free_params:
+        raise ValueError("Select at least one free parameter to fit")
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if y.size == 0:
+        raise ValueError("No numeric data points to fit in the selected columns")
+
+    for param in free_params:
+        if not bounds[param][0] < bounds[param][1]:
+            raise ValueError(f"Fit range for '{param}' is empty (min = {bounds[param][0]}, "
+                             f"max = {bounds[param][1]}); keep it fixed instead")
+    lower = np.array([bounds[param][0] for param in free_params], dtype=float)
+    upper = np.array([bounds[param][1] for param in free_params], dtype=float)
+
+    rng = np.random.default_rng(seed)
+    starts = [np.clip([fixed_values[param] for param in free_params], lower, upper)]
+    starts += list(rng.uniform(lower, upper, size=(n_starts - 1, len(free_params))))
+
+    executor = get_fit_executor()
+    futures = [
+        asyncio.wrap_future(executor.submit(fit_single_start, func_list, target, x_label, x, y,
+                                            free_params, fixed_values, start, (lower, upper)))
+        for start in starts
+    ]
+
+    best_theta, best_rss, converged, failures = None, np.inf, 0, []
+    for done, future in enumerate(asyncio.as_completed(futures), start=1):
+        theta, rss, message, success = await future
+        if theta is not None:
+            # Only starts that met least_squares' stopping tolerances count as converged
+            converged += bool(success)
+            if rss < best_rss:
+                best_theta, best_rss = theta, rss
+        else:
+            failures.append(message)
+        if progress is not None:
+            progress(done, len(futures))
+
+    if best_theta is None:
+        raise ValueError(f"No start point gave a finite fit ({failures[0]})")
+
+    values = dict(fixed_values)
+    values.update(zip(free_params, best_theta))
+    ss_tot = np.sum((y - y.mean()) ** 2)
+
+    # Free parameters that ended on a fit limit; the true optimum is probably outside the range
+    tolerance = 1e-4 * (upper - lower)
+    at_limit = [
+        param for param, value, lo, hi, tol in zip(free_params, best_theta, lower, upper, tolerance)
+        if value - lo <= tol or hi - value <= tol
+    ]
+    return {
+        "values": values,
+        "free_params": list(free_params),
+        "at_limit": at_limit,
+        "rss": best_rss,
+        "r2": 1 - best_rss / ss_tot if ss_tot > 0 else np.nan,
+        "converged": converged,
+        "n_starts": len(futures)
+    }
+
+
+# Slider range and default for a parameter, falling back to the line sliders' -10..10 / 1 defaults
+def fit_defaults(sliders, param):
+    slider = sliders.get(param, {})
+    return slider.get("min", -10), slider.get("max", 10), slider.get("value", 1)
+
+
+# Loads an uploaded CSV or Excel file into a DataFrame
+def read_fit_data(path, name):
+    if name.lower().endswith(".csv"):
+        return pd.read_csv(path)
+    return pd.read_excel(path)
+
+# ====================== FIT UI MODULE ======================
+# UI for fitting model parameters to an uploaded i-V dataset.
+# Each model parameter gets an initial/fixed value input; the checkboxes choose which are fitted.
+@module.ui
+def fit_ui(func_list, free_params, x_label, sliders):
+    params = model_parameters(func_list, x_label)
+
+    # Initial values and fit limits default to the slider settings of the linked line plot
+    value_inputs = []
+    for param in params:
+        min_val, max_val, value = fit_defaults(sliders, param)
+        value_inputs += [
+            ui.input_numeric(f"init_{param}", f"Initial / fixed value for {param}:", value=value),
+            ui.input_numeric(f"min_{param}", f"Fit min for {param}:", value=min_val),
+            ui.input_numeric(f"max_{param}", f"Fit max for {param}:", value=max_val),
+        ]
+
+    return ui.page_fluid(
+        ui.div(
+            ui.card(
+                ui.card_header("Fit Parameters to Data"),  # Title shown at the top of the card
+                ui.layout_sidebar(
+                    ui.sidebar(
+                        ui.input_checkbox_group("free_params", "Free parameters:",
+                                                choices=params, selected=free_params),
+                        *value_inputs,
+                        ui.input_numeric("n_starts", "Number of starts:", value=8, min=1, max=MAX_FIT_STARTS),
+                        ui.input_action_button("reset_fit", "RESET", class_="btn-primary"),
+                        width="40%",  # Sidebar width
+                        open="closed"  # Start in collapsed state
+                    ),
+                    ui.input_file("data_file", "Upload i-V data (.csv or .xlsx):",
+                                  accept=[".csv", ".xlsx"]),
+                    ui.input_select("x_column", "Column for x:", choices=[]),
+                    ui.input_select("y_column", "Column for y:", choices=[]),
+                    ui.input_action_button("run_fit", "FIT", class_="btn-primary"),
+                    ui.output_table("fit_table"),  # Fitted parameter values
+                    ui.output_ui("plot_fit")  # Data with the fitted curve overlaid
+                ),
+                fill=False
+            ),
+            style="width: 800px;"  # Card width
+        )
+    )
+
+# ====================== FIT SERVER MODULE ======================
+# Loads the uploaded data, runs the multi-start fit with a progress bar,
+# and overlays the fitted curve on the measured points.
+@module.server
+def fit_server(input, output, session, func_list, target, free_params, x_label, sliders):
+    params = model_parameters(func_list, x_label)
+    fit_result = reactive.value(None)
+
+    data = reactive.value(None)
+
+    # ---------- Uploaded data ----------
+    # Read errors are reported as notifications; an unhandled error here would close the session
+    @reactive.effect
+    @reactive.event(input.data_file)
+    def _():
+        files = input.data_file()
+        if not files:
+            return
+        try:
+            df = read_fit_data(files[0]["datapath"], files[0]["name"])
+        except Exception as e:
+            ui.notification_show(f"Could not read '{files[0]['name']}': {e}", type="error")
+            data.set(None)
+            fit_result.set(None)
+            return
+        data.set(df)
+
+        # Offer the uploaded columns for x and y, preferring the model's own names when present
+        columns = list(df.columns)
+        ui.update_select("x_column", choices=columns,
+                         selected=x_label if x_label in columns else columns[0])
+        ui.update_select("y_column", choices=columns,
+                         selected=target if target in columns else columns[-1])
+        fit_result.set(None)
+
+    # A fit only belongs to the columns it was run on
+    @reactive.effect
+    @reactive.event(input.x_column, input.y_column)
+    def _():
+        fit_result.set(None)
+
+    # Numeric x/y arrays from the selected columns, dropping rows that are not numbers
+    def xy():
+        df = data()
+        x_col, y_col = input.x_column(), input.y_column()
+        if df is None or x_col not in df.columns or y_col not in df.columns:
+            return None
+        clean = df[[x_col, y_col]].apply(pd.to_numeric, errors="coerce").dropna()
+        return clean[x_col].to_numpy(dtype=float), clean[y_col].to_numpy(dtype=float)
+
+    # ---------- Reactive Reset Handler ----------
+    @reactive.effect
+    @reactive.event(input.reset_fit)
+    def _():
+        for param in params:
+            min_val, max_val, value = fit_defaults(sliders, param)
+            ui.update_numeric(f"init_{param}", value=value)
+            ui.update_numeric(f"min_{param}", value=min_val)
+            ui.update_numeric(f"max_{param}", value=max_val)
+        ui.update_checkbox_group("free_params", selected=free_params)
+        fit_result.set(None)
+
+    # ---------- Run the fit ----------
+    @reactive.effect
+    @reactive.event(input.run_fit)
+    async def _():
+        points = xy()
+        if points is None:
+            ui.notification_show("Upload a data file and choose the x and y columns first", type="warning")
+            return
+
+        free = list(input.free_params())
+        fixed_values = {param: input[f"init_{param}"]() for param in params}
+        bounds = {param: (input[f"min_{param}"](), input[f"max_{param}"]()) for param in params}
+        missing = [param for param in free if None in bounds[param]]
+        if missing:
+            ui.notification_show(f"Enter a fit min and max for {', '.join(missing)}", type="warning")
+            return
+        n_starts = min(max(1, int(input.n_starts() or 1)), MAX_FIT_STARTS)
+
+        with ui.Progress(min=0, max=n_starts) as p:
+            p.set(0, message="Fitting", detail=f"0/{n_starts} starts finished")
+            try:
+                result = await fit_model(func_list, target, x_label, points[0], points[1], free,
+                                         fixed_values, bounds, n_starts,
+                                         progress=lambda done, total: p.set(
+                                             done, detail=f"{done}/{total} starts finished"))
+            except Exception as e:
+                ui.notification_show(f"Fit failed: {e}", type="error")
+                return
+        fit_result.set(result)
+
+        # Flag fits that are unlikely to be meaningful instead of presenting them as clean
+        warnings = []
+        if result["at_limit"]:
+            warnings.append(f"{', '.join(result['at_limit'])} ended on a fit limit; widen the fit min/max")
+        if not result["r2"] > 0:
+            warnings.append(f"R² = {result['r2']:.3g}; the model does not describe the data")
+        if result["converged"] == 0:
+            warnings.append("no start converged; showing the best unconverged result")
+        if warnings:
+            ui.notification_show("Check the fit: " + "; ".join(warnings), type="warning", duration=None)
+
+    # ---------- Table of fitted values ----------
+    @render.table
+    def fit_table():
+        result = fit_result()
+        if result is None:
+            return None
+        rows = [
+            {"parameter": param, "value": result["values"][param],
+             "status": ("fitted (at limit)" if param in result["at_limit"] else "fitted")
+             if param in result["free_params"] else "fixed"}
+            for param in params
+        ]
+        rows.append({"parameter": "R²", "value": result["r2"],
+                     "status": f"{result['converged']}/{result['n_starts']} starts converged"})
+        return pd.DataFrame(rows)
+
+    # ---------- Data with fitted curve overlaid ----------
+    @output
+    @render.ui
+    def plot_fit():
+        points = xy()
+        if points is None:
+            return None
+        x, y = points
+        try:
+            # Thin very large datasets for display only; the fit always uses every point
+            stride = max(1, len(x) // 20000)
+            fig = go.Figure(data=[
+                go.Scattergl(x=x[::stride], y=y[::stride], mode='markers', name='Data',
+                             marker=dict(size=3))
+            ])
+
+            result = fit_result()
+            if result is not None:
+                x_fit = np.linspace(x.min(), x.max(), 500)
+                y_fit = evaluate_model(compile_model(func_list), target, x_label, x_fit, result["values"])
+                fig.add_trace(go.Scatter(x=x_fit, y=y_fit, mode='lines', name=f'Fitted {target}'))
+
+            fig.update_layout(
+                xaxis_title=x_label,
+                yaxis_title=target,
+                title=f'Fit of {target} vs {x_label}',
+            )
+            return ui.HTML(pio.to_html(fig, full_html=True))
+
+        except Exception as e:
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=[0], y=[0], mode='text',
+                text=f"Error: {e}", textposition='middle center'
+            ))
+            return ui.HTML(pio.to_html(fig, full_html=True))
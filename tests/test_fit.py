@@ -0,0 +1,87 @@
+# ====================== TESTS FOR THE FITTING UTILITIES ======================
+# These run the fit on the equations app.py actually builds from givefile.py,
+# so formatting from `substitute_variables` (e.g. "lhs = rhs") is covered too.
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402  (parses givefile.py on import)
+from libfile import compile_model, evaluate_model, fit_model, model_chain  # noqa: E402
+
+
+# Equation chain, x label and slider settings behind the "fit1" block in givefile.py
+def givefile_model():
+    plot = app.line_plots["func1"]
+    func_list = model_chain(plot['func_list1'] + plot['func_list2'], "i_total")
+    return func_list, plot['x_label'], plot['sliders']
+
+
+def test_compile_model_on_givefile_equations():
+    func_list, x_label, sliders = givefile_model()
+    values = {param: slider['value'] for param, slider in sliders.items()}
+    x = np.linspace(-250, 250, 11)
+
+    y = evaluate_model(compile_model(func_list), "i_total", x_label, x, values)
+
+    assert y.shape == x.shape
+    assert np.all(np.isfinite(y))
+
+
+def test_fit_model_recovers_parameters():
+    func_list, x_label, sliders = givefile_model()
+    bounds = {param: (slider['min'], slider['max']) for param, slider in sliders.items()}
+    fixed_values = {param: slider['value'] for param, slider in sliders.items()}
+    true_values = dict(fixed_values, k=-3.0, beta=0.35, U=40.0)
+
+    x = np.linspace(-250, 250, 2000)
+    y = evaluate_model(compile_model(func_list), "i_total", x_label, x, true_values)
+
+    result = asyncio.run(fit_model(func_list, "i_total", x_label, x, y, ["k", "beta", "U"],
+                                   fixed_values, bounds, n_starts=4, seed=0))
+
+    assert result["values"]["k"] == pytest.approx(-3.0, rel=1e-2)
+    assert result["values"]["beta"] == pytest.approx(0.35, rel=1e-2)
+    assert result["values"]["U"] == pytest.approx(40.0, abs=1.0)
+    assert result["r2"] == pytest.approx(1.0)
+    assert result["converged"] >= 1
+    assert result["at_limit"] == []
+
+
+def test_fit_model_reports_parameters_on_a_limit():
+    func_list, x_label, sliders = givefile_model()
+    bounds = {param: (slider['min'], slider['max']) for param, slider in sliders.items()}
+    fixed_values = {param: slider['value'] for param, slider in sliders.items()}
+    true_values = dict(fixed_values, k=-3.0)
+
+    x = np.linspace(-250, 250, 2000)
+    y = evaluate_model(compile_model(func_list), "i_total", x_label, x, true_values)
+
+    # The true k = -3 lies outside the fit range, so k must end on its upper limit
+    bounds["k"] = (-11, -5)
+    result = asyncio.run(fit_model(func_list, "i_total", x_label, x, y, ["k"],
+                                   fixed_values, bounds, n_starts=2, seed=0))
+
+    assert result["at_limit"] == ["k"]
+    assert result["values"]["k"] == pytest.approx(-5.0, abs=1e-3)
+
+
+def test_fit_model_rejects_empty_data_and_ranges():
+    func_list, x_label, sliders = givefile_model()
+    bounds = {param: (slider['min'], slider['max']) for param, slider in sliders.items()}
+    fixed_values = {param: slider['value'] for param, slider in sliders.items()}
+
+    with pytest.raises(ValueError, match="No numeric data"):
+        asyncio.run(fit_model(func_list, "i_total", x_label, [], [], ["k"],
+                              fixed_values, bounds))
+
+    bounds["k"] = (-4, -4)
+    x = np.linspace(-250, 250, 11)
+    with pytest.raises(ValueError, match="range for 'k' is empty"):
+        asyncio.run(fit_model(func_list, "i_total", x_label, x, x, ["k"],
+                              fixed_values, bounds))